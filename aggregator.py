@@ -1,24 +1,38 @@
-from typing import List, Dict
+import sys
+from typing import List, Dict, Union
 from collections import defaultdict
+import numpy as np
+import pandas as pd
 from models import Transaction
 
+RULE = "=" * 120
+THIN_RULE = "-" * 120
+
 
 class TransactionAggregator:
     """Aggregate and summarize transactions"""
 
     @staticmethod
-    def filter_spending_only(transactions: List[Transaction]) -> List[Transaction]:
+    def filter_spending_only(transactions: Union[List[Transaction], pd.DataFrame]) -> Union[List[Transaction], pd.DataFrame]:
         """Filter out Payment/Credit transactions to get actual spending"""
-        return [t for t in transactions if t.category != "Payment/Credit"]
+        if isinstance(transactions, pd.DataFrame):
+            return transactions[~transactions['IsPayment']]
+        return [t for t in transactions if not t.is_payment]
 
     @staticmethod
-    def aggregate_by_category(transactions: List[Transaction], exclude_payments: bool = True) -> Dict[str, float]:
-        """Calculate total spending per category"""
-        totals = defaultdict(float)
+    def aggregate_by_category(transactions: Union[List[Transaction], pd.DataFrame], exclude_payments: bool = True) -> Union[Dict[str, float], pd.Series]:
+        """Calculate total spending per category.
 
+        Accepts either a list of transactions (returns a dict) or a DataFrame
+        as built by the web app (returns a Series, using pandas' groupby kernels).
+        """
         if exclude_payments:
             transactions = TransactionAggregator.filter_spending_only(transactions)
 
+        if isinstance(transactions, pd.DataFrame):
+            return transactions.groupby('Category', sort=False, observed=True)['Amount'].sum()
+
+        totals = defaultdict(float)
         for transaction in transactions:
             category = transaction.category or "Uncategorized"
             totals[category] += transaction.amount
@@ -26,61 +40,88 @@ class TransactionAggregator:
         return dict(totals)
 
     @staticmethod
-    def aggregate_by_card(transactions: List[Transaction], exclude_payments: bool = True) -> Dict[str, float]:
-        """Calculate total spending per card"""
-        totals = defaultdict(float)
+    def aggregate_by_card(transactions: Union[List[Transaction], pd.DataFrame], exclude_payments: bool = True) -> Union[Dict[str, float], pd.Series]:
+        """Calculate total spending per card.
 
+        Accepts either a list of transactions (returns a dict) or a DataFrame
+        as built by the web app (returns a Series, using pandas' groupby kernels).
+        """
         if exclude_payments:
             transactions = TransactionAggregator.filter_spending_only(transactions)
 
+        if isinstance(transactions, pd.DataFrame):
+            return transactions.groupby('Card', sort=False, observed=True)['Amount'].sum()
+
+        totals = defaultdict(float)
         for transaction in transactions:
             totals[transaction.card_provider] += transaction.amount
 
         return dict(totals)
 
+    @staticmethod
+    def _to_arrays(transactions: List[Transaction]):
+        """Extract (amounts, payment_mask, categories, cards) arrays from transactions"""
+        n = len(transactions)
+        amounts = np.fromiter((t.amount for t in transactions), dtype=np.float64, count=n)
+        payment_mask = np.fromiter((t.is_payment for t in transactions), dtype=bool, count=n)
+        categories = np.array([t.category or "Uncategorized" for t in transactions], dtype=object)
+        cards = np.array([t.card_provider for t in transactions], dtype=object)
+        return amounts, payment_mask, categories, cards
+
+    @staticmethod
+    def _sum_by_group(codes: np.ndarray, amounts: np.ndarray, n_groups: int) -> np.ndarray:
+        """Sum amounts per group, where codes[i] is the group index of amounts[i]"""
+        return np.bincount(codes, weights=amounts, minlength=n_groups)
+
     @staticmethod
     def print_summary(transactions: List[Transaction]):
         """Print a detailed summary of all transactions"""
 
-        print("\n" + "=" * 120)
+        print("\n" + RULE)
         print("TRANSACTION SUMMARY")
-        print("=" * 120)
+        print(RULE)
+
+        amounts, payment_mask, categories, cards = TransactionAggregator._to_arrays(transactions)
+        spending_mask = ~payment_mask
+        spending_amounts = amounts[spending_mask]
 
-        # Separate spending from payments
-        spending_transactions = TransactionAggregator.filter_spending_only(transactions)
-        payment_transactions = [t for t in transactions if t.category == "Payment/Credit"]
+        total_spending = spending_amounts.sum()
+        total_payments = amounts[payment_mask].sum()
+        spending_count = len(spending_amounts)
+        payment_count = int(payment_mask.sum())
 
-        # Overall stats
-        total_transactions = len(spending_transactions)
-        total_spending = sum(t.amount for t in spending_transactions)
-        total_payments = sum(t.amount for t in payment_transactions)
+        # Factorize once, then sum per group by integer code
+        cat_codes, cat_uniques = pd.factorize(categories[spending_mask])
+        card_codes, card_uniques = pd.factorize(cards[spending_mask])
+        category_totals = TransactionAggregator._sum_by_group(cat_codes, spending_amounts, len(cat_uniques))
+        card_totals = TransactionAggregator._sum_by_group(card_codes, spending_amounts, len(card_uniques))
 
-        print(f"\nSpending Transactions: {total_transactions}")
+        print(f"\nSpending Transactions: {spending_count}")
         print(f"Total Spending: ${abs(total_spending):,.2f}")
-        if payment_transactions:
-            print(f"Payments/Credits: ${abs(total_payments):,.2f} ({len(payment_transactions)} transactions)")
+        if payment_count:
+            print(f"Payments/Credits: ${abs(total_payments):,.2f} ({payment_count} transactions)")
 
         # By category
-        category_totals = TransactionAggregator.aggregate_by_category(transactions)
-        print("\n" + "-" * 120)
+        print("\n" + THIN_RULE)
         print("BY CATEGORY:")
-        print("-" * 120)
+        print(THIN_RULE)
 
-        for category, total in sorted(category_totals.items(), key=lambda x: x[1], reverse=True):
+        for idx in np.argsort(-category_totals, kind='stable'):
+            total = category_totals[idx]
             percentage = (total / total_spending * 100) if total_spending != 0 else 0
-            print(f"{category:25} ${total:10.2f} ({percentage:5.1f}%)")
+            print(f"{cat_uniques[idx]:25} ${total:10.2f} ({percentage:5.1f}%)")
 
         # By card
-        card_totals = TransactionAggregator.aggregate_by_card(transactions)
-        print("\n" + "-" * 120)
+        print("\n" + THIN_RULE)
         print("BY CARD:")
-        print("-" * 120)
+        print(THIN_RULE)
 
-        for card, total in sorted(card_totals.items()):
+        for idx in np.argsort(card_uniques, kind='stable'):
+            total = card_totals[idx]
             percentage = (total / total_spending * 100) if total_spending != 0 else 0
-            print(f"{card:25} ${total:10.2f} ({percentage:5.1f}%)")
+            print(f"{card_uniques[idx]:25} ${total:10.2f} ({percentage:5.1f}%)")
 
-        print("\n" + "=" * 120)
+        print("\n" + RULE)
 
     @staticmethod
     def print_detailed_transactions(transactions: List[Transaction], category_filter: str = None):
@@ -90,18 +131,20 @@ class TransactionAggregator:
         if category_filter:
             filtered = [t for t in transactions if t.category == category_filter]
 
-        print("\n" + "=" * 120)
+        print("\n" + RULE)
         if category_filter:
             print(f"TRANSACTIONS - {category_filter}")
         else:
             print("ALL TRANSACTIONS")
-        print("=" * 120)
+        print(RULE)
         print(f"{'Date':<12} {'Card':<6} {'Amount':>10} {'Description':<45} {'Category':<20}")
-        print("-" * 120)
+        print(THIN_RULE)
 
-        for t in filtered:
-            print(t)
+        # One buffered write instead of a print() per row
+        if filtered:
+            format_row = Transaction.__str__
+            sys.stdout.write("\n".join(map(format_row, filtered)) + "\n")
 
-        print("-" * 120)
+        print(THIN_RULE)
         print(f"Total: ${sum(t.amount for t in filtered):,.2f} ({len(filtered)} transactions)")
-        print("=" * 120)
+        print(RULE)
@@ -4,16 +4,19 @@ Credit Card Statement Processor - Web Interface
 A Streamlit app for processing and categorizing credit card statements.
 """
 
+import hashlib
 import os
 
 # Fix for macOS fork crash in multi-threaded Streamlit environment
 os.environ['OBJC_DISABLE_INITIALIZE_FORK_SAFETY'] = 'YES'
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from pathlib import Path
 from dotenv import load_dotenv
+import shutil
 import tempfile
 
 from parser import CSVSchemaDetector, CSVParser
@@ -24,6 +27,10 @@ from models import Transaction
 # Load environment variables
 load_dotenv()
 
+# Column dtypes for the transactions DataFrame
+DATE_DTYPE = np.dtype('datetime64[us]')
+AMOUNT_DTYPE = np.dtype(np.float64)
+
 # Page configuration
 st.set_page_config(
     page_title="Statement Processor",
@@ -33,8 +40,7 @@ st.set_page_config(
 )
 
 # Modern CSS styling
-st.markdown("""
-<style>
+_CSS = """
     /* Main container */
     .block-container {
         padding: 2rem 3rem;
@@ -161,50 +167,251 @@ st.markdown("""
         padding: 1rem;
         text-align: center;
     }
-</style>
-""", unsafe_allow_html=True)
+"""
 
 
-def process_uploaded_files(uploaded_files, api_key):
-    """Process uploaded CSV files and return transactions"""
+def _inject_css():
+    """Inject the app stylesheet.
+
+    Runs on every rerun: Streamlit only keeps elements the current run emits,
+    so this message can't be skipped (a cached call would just replay it).
+    """
+    st.markdown(f"<style>{_CSS}</style>", unsafe_allow_html=True)
+
+
+_inject_css()
+
+
+# Process-wide caches: keep a bounded number of recent uploads, and let results age out
+_UPLOAD_CACHE = dict(ttl="1h", max_entries=16)
+
+
+class _FallbackCategorization(Exception):
+    """Carries a categorization out of the cache when some of it is only a fallback"""
+
+    def __init__(self, transactions):
+        super().__init__("categorization incomplete")
+        self.transactions = transactions
 
-    if not uploaded_files:
-        return []
+
+@st.cache_data(show_spinner=False, **_UPLOAD_CACHE)
+def _parse_files(uploaded_files, api_key_hash, _api_key):
+    """Parse uploaded CSV files into transactions.
+
+    Cached on the uploads (Streamlit hashes UploadedFile by name and contents)
+    and a hash of the API key, so re-processing identical uploads skips schema
+    detection entirely.
+    """
 
     # Create a temporary directory to store uploaded files
     with tempfile.TemporaryDirectory() as temp_dir:
         temp_path = Path(temp_dir)
 
-        # Save uploaded files
+        # Stream uploaded files to disk in 1 MiB chunks
         for uploaded_file in uploaded_files:
             file_path = temp_path / uploaded_file.name
+            uploaded_file.seek(0)
             with open(file_path, 'wb') as f:
-                f.write(uploaded_file.getbuffer())
+                shutil.copyfileobj(uploaded_file, f, length=1024 * 1024)
+            uploaded_file.seek(0)  # Reset so the cache key stays stable
 
         # Parse CSV files
-        schema_detector = CSVSchemaDetector(api_key)
+        schema_detector = CSVSchemaDetector(_api_key)
         parser = CSVParser(schema_detector)
-        transactions = parser.parse_all(temp_path)
+        return parser.parse_all(temp_path)
+
+
+@st.cache_data(show_spinner=False, **_UPLOAD_CACHE)
+def _categorize_cached(transactions, api_key_hash, _api_key):
+    """Categorize parsed transactions, cached on the transactions themselves.
+
+    Results with "Other" fallbacks are raised instead of returned, which keeps
+    st.cache_data from storing them; re-uploading then retries those merchants.
+    """
+    categorizer = TransactionCategorizer(_api_key)
+    transactions = categorizer.categorize_transactions(transactions)
+    if categorizer.fallback_count:
+        raise _FallbackCategorization(transactions)
+    return transactions
+
+
+def _categorize(transactions, api_key_hash, api_key):
+    """Categorize parsed transactions, reusing complete cached results"""
+    try:
+        return _categorize_cached(transactions, api_key_hash, api_key)
+    except _FallbackCategorization as partial:
+        return partial.transactions
+
+
+def process_uploaded_files(uploaded_files, api_key):
+    """Process uploaded CSV files and return transactions"""
+
+    if not uploaded_files:
+        return []
 
-        # Categorize transactions
-        categorizer = TransactionCategorizer(api_key)
-        transactions = categorizer.categorize_transactions(transactions)
+    api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:8]
 
-        return transactions
+    transactions = _parse_files(tuple(uploaded_files), api_key_hash, api_key)
+    return _categorize(transactions, api_key_hash, api_key)
 
 
 def transactions_to_dataframe(transactions):
-    """Convert transactions to pandas DataFrame"""
-    data = []
-    for t in transactions:
-        data.append({
-            'Date': t.date.strftime('%Y-%m-%d'),
-            'Card': t.card_provider,
-            'Description': t.description,
-            'Amount': t.amount,
-            'Category': t.category or 'Uncategorized'
+    """Convert transactions to pandas DataFrame.
+
+    Card and Category are low-cardinality, so they are stored as categoricals
+    (groupbys then run on integer codes); Description is Arrow-backed and Date
+    is kept as datetime64.
+    """
+    # Build column-wise rather than from per-row dicts, with dtypes declared
+    # up front so pandas skips its type-inference pass. One loop visits each
+    # transaction once to fill every column.
+    n = len(transactions)
+    dates = np.empty(n, dtype=DATE_DTYPE)
+    amounts = np.empty(n, dtype=AMOUNT_DTYPE)
+    is_payment = np.empty(n, dtype=bool)
+    cards = [None] * n
+    descriptions = [None] * n
+    categories = [None] * n
+
+    for i, t in enumerate(transactions):
+        # Keep the statement's wall-clock time; numpy would shift aware datetimes to UTC
+        dates[i] = t.date.replace(tzinfo=None) if t.date.tzinfo is not None else t.date
+        amounts[i] = t.amount
+        is_payment[i] = t.is_payment
+        cards[i] = t.card_provider
+        descriptions[i] = t.description
+        categories[i] = t.category or 'Uncategorized'
+
+    return pd.DataFrame({
+        'Date': dates,
+        'Card': pd.Categorical(cards),
+        'Description': pd.array(descriptions, dtype='string[pyarrow]'),
+        'Amount': amounts,
+        'Category': pd.Categorical(categories),
+        'IsPayment': is_payment,
+    })
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_category_chart(chart_type, categories, amounts):
+    """Build the category bar or pie chart from parallel (descending) tuples.
+
+    Cached on the chart type and data, so reruns that don't change either
+    reuse the figure.
+    """
+    if chart_type == "Bar":
+        # Create dataframe for chart (sorted ascending for horizontal bar)
+        chart_df = pd.DataFrame({
+            'Category': categories[::-1],
+            'Amount': amounts[::-1]
         })
-    return pd.DataFrame(data)
+
+        # Color scale based on amount
+        colors = px.colors.sample_colorscale(
+            'Blues',
+            [i / (len(chart_df) - 1) if len(chart_df) > 1 else 0.5 for i in range(len(chart_df))]
+        )
+
+        fig = go.Figure(go.Bar(
+            x=chart_df['Amount'],
+            y=chart_df['Category'],
+            orientation='h',
+            text=[f'${x:,.0f}' for x in chart_df['Amount']],
+            textposition='outside',
+            marker=dict(
+                color=colors,
+                cornerradius=6
+            ),
+            textfont=dict(size=12, color='#495057')
+        ))
+
+        fig.update_layout(
+            showlegend=False,
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            margin=dict(l=0, r=100, t=10, b=10),
+            height=max(350, len(chart_df) * 50),
+            xaxis=dict(
+                showgrid=True,
+                gridcolor='#f1f3f4',
+                tickformat='$,.0f',
+                title='',
+                zeroline=False
+            ),
+            yaxis=dict(
+                title='',
+                tickfont=dict(size=13, color='#495057')
+            )
+        )
+    else:
+        # Pie chart
+        fig = go.Figure(go.Pie(
+            labels=list(categories),
+            values=list(amounts),
+            textinfo='label+percent',
+            textposition='outside',
+            hole=0.4,
+            marker=dict(
+                colors=px.colors.qualitative.Set3
+            ),
+            textfont=dict(size=11)
+        ))
+
+        fig.update_layout(
+            showlegend=False,
+            margin=dict(l=20, r=20, t=20, b=20),
+            height=400,
+            paper_bgcolor='rgba(0,0,0,0)'
+        )
+
+    return fig
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def filter_view(df_version, category, card, _spending_df):
+    """Filter spending by category/card and sort most recent first.
+
+    Cached on df_version (the content hash of df) plus the selections, so
+    toggling back to a previous filter returns the cached view.
+    """
+    # Fuse both filters into one mask, comparing the categoricals' integer codes
+    mask = np.ones(len(_spending_df), dtype=bool)
+    for column, value in (('Category', category), ('Card', card)):
+        if value != 'All':
+            col = _spending_df[column].cat
+            mask &= (col.codes.values == col.categories.get_loc(value))
+    return _spending_df.iloc[mask].sort_values('Date', ascending=False)
+
+
+def store_views(df):
+    """Store df and the views derived from it in session state.
+
+    Each rerun (tab switch, filter change) re-executes the whole script, so the
+    spending split and groupbys are computed once here rather than per rerun.
+    df_version is a content hash of df, used to key anything cached on it.
+    """
+    # Drop categories only payments used, so .cat.categories is exactly the
+    # (sorted) set of values present in spending
+    spending_df = TransactionAggregator.filter_spending_only(df).assign(
+        Card=lambda d: d['Card'].cat.remove_unused_categories(),
+        Category=lambda d: d['Category'].cat.remove_unused_categories(),
+    )
+
+    st.session_state['df'] = df
+    st.session_state['df_version'] = int(pd.util.hash_pandas_object(df).sum())
+    st.session_state['spending_df'] = spending_df
+    st.session_state['total_amount'] = spending_df['Amount'].sum()
+
+    # One pass over spending_df by (Card, Category); the per-card and
+    # per-category views are then rolled up from the small grouped result
+    agg = spending_df.groupby(['Card', 'Category'], sort=False, observed=True)['Amount'].agg(sum='sum', count='count')
+    cat_stats = agg.groupby(level='Category', sort=False, observed=True).sum().sort_values('sum', ascending=False)
+    st.session_state['card_totals'] = agg.groupby(level='Card', sort=False, observed=True)['sum'].sum().sort_values(ascending=False)
+    st.session_state['category_totals'] = cat_stats['sum']
+    st.session_state['category_counts'] = cat_stats['count']
+
+    st.session_state['category_options'] = ['All'] + spending_df['Category'].cat.categories.tolist()
+    st.session_state['card_options'] = ['All'] + spending_df['Card'].cat.categories.tolist()
 
 
 def main():
@@ -221,7 +428,7 @@ def main():
         st.session_state.selected_card = 'All'
 
     # Show upload area only if no data processed yet
-    if 'transactions' not in st.session_state or not st.session_state['transactions']:
+    if 'df' not in st.session_state:
         st.title("Statement Processor")
         st.caption("Upload your credit card statements and let AI categorize your spending")
 
@@ -263,22 +470,19 @@ def main():
             st.warning("No transactions found in the uploaded files.")
             st.stop()
 
-        # Store in session state
-        st.session_state['transactions'] = transactions
-        st.session_state['df'] = transactions_to_dataframe(transactions)
+        # Store in session state (the DataFrame is the only copy kept)
+        store_views(transactions_to_dataframe(transactions))
         st.rerun()
 
     # Display results if we have processed transactions
-    if 'transactions' in st.session_state and st.session_state['transactions']:
-        transactions = st.session_state['transactions']
-        df = st.session_state['df']
+    if 'df' in st.session_state:
+        if 'spending_df' not in st.session_state:
+            store_views(st.session_state['df'])
 
-        # Separate spending from payments
-        spending_df = df[df['Category'] != 'Payment/Credit']
-        payment_df = df[df['Category'] == 'Payment/Credit']
+        spending_df = st.session_state['spending_df']
 
         # Summary metrics at top
-        total_amount = spending_df['Amount'].sum()
+        total_amount = st.session_state['total_amount']
         total_transactions = len(spending_df)
 
         col1, col2, col3 = st.columns(3)
@@ -299,20 +503,21 @@ def main():
         with tab1:
             # Spend by Card Section
             st.subheader("Spend by Card")
-            card_totals = spending_df.groupby('Card')['Amount'].sum().sort_values(ascending=False)
+            card_totals = st.session_state['card_totals']
 
             if not card_totals.empty:
-                cols = st.columns(len(card_totals))
-                for idx, (card, amount) in enumerate(card_totals.items()):
-                    with cols[idx]:
-                        pct = (amount / total_amount * 100) if total_amount > 0 else 0
-                        st.markdown(f"""
-                        <div style="background: white; border: 1px solid #e9ecef; border-radius: 12px; padding: 1.25rem; text-align: center;">
-                            <div style="font-size: 0.85rem; color: #6c757d; margin-bottom: 0.5rem;">{card}</div>
-                            <div style="font-size: 1.5rem; font-weight: 700; color: #1a1a2e;">${amount:,.0f}</div>
-                            <div style="font-size: 0.8rem; color: #6c757d;">{pct:.1f}%</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                # Render all cards as one flex row in a single markdown message
+                html_parts = []
+                for card, amount in card_totals.items():
+                    pct = (amount / total_amount * 100) if total_amount > 0 else 0
+                    html_parts.append(
+                        f'<div style="flex: 1; background: white; border: 1px solid #e9ecef; border-radius: 12px; padding: 1.25rem; text-align: center;">'
+                        f'<div style="font-size: 0.85rem; color: #6c757d; margin-bottom: 0.5rem;">{card}</div>'
+                        f'<div style="font-size: 1.5rem; font-weight: 700; color: #1a1a2e;">${amount:,.0f}</div>'
+                        f'<div style="font-size: 0.8rem; color: #6c757d;">{pct:.1f}%</div>'
+                        f'</div>'
+                    )
+                st.markdown(f'<div style="display: flex; gap: 1rem;">{"".join(html_parts)}</div>', unsafe_allow_html=True)
 
             st.write("")  # Spacing
 
@@ -328,77 +533,18 @@ def main():
                     label_visibility="collapsed"
                 )
 
-            category_totals = spending_df.groupby('Category')['Amount'].sum().sort_values(ascending=False)
-            category_counts = spending_df.groupby('Category').size()
+            category_totals = st.session_state['category_totals']
+            category_counts = st.session_state['category_counts']
 
             # Two columns: chart and table
             col_chart, col_table = st.columns([2, 1])
 
             with col_chart:
-                if chart_type == "Bar":
-                    # Create dataframe for chart (sorted ascending for horizontal bar)
-                    chart_df = pd.DataFrame({
-                        'Category': category_totals.index[::-1],
-                        'Amount': category_totals.values[::-1]
-                    })
-
-                    # Color scale based on amount
-                    colors = px.colors.sample_colorscale(
-                        'Blues',
-                        [i / (len(chart_df) - 1) if len(chart_df) > 1 else 0.5 for i in range(len(chart_df))]
-                    )
-
-                    fig = go.Figure(go.Bar(
-                        x=chart_df['Amount'],
-                        y=chart_df['Category'],
-                        orientation='h',
-                        text=[f'${x:,.0f}' for x in chart_df['Amount']],
-                        textposition='outside',
-                        marker=dict(
-                            color=colors,
-                            cornerradius=6
-                        ),
-                        textfont=dict(size=12, color='#495057')
-                    ))
-
-                    fig.update_layout(
-                        showlegend=False,
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        margin=dict(l=0, r=100, t=10, b=10),
-                        height=max(350, len(category_totals) * 50),
-                        xaxis=dict(
-                            showgrid=True,
-                            gridcolor='#f1f3f4',
-                            tickformat='$,.0f',
-                            title='',
-                            zeroline=False
-                        ),
-                        yaxis=dict(
-                            title='',
-                            tickfont=dict(size=13, color='#495057')
-                        )
-                    )
-                else:
-                    # Pie chart
-                    fig = go.Figure(go.Pie(
-                        labels=category_totals.index,
-                        values=category_totals.values,
-                        textinfo='label+percent',
-                        textposition='outside',
-                        hole=0.4,
-                        marker=dict(
-                            colors=px.colors.qualitative.Set3
-                        ),
-                        textfont=dict(size=11)
-                    ))
-
-                    fig.update_layout(
-                        showlegend=False,
-                        margin=dict(l=20, r=20, t=20, b=20),
-                        height=400,
-                        paper_bgcolor='rgba(0,0,0,0)'
-                    )
+                fig = build_category_chart(
+                    chart_type,
+                    tuple(category_totals.index),
+                    tuple(category_totals.values.tolist())
+                )
 
                 st.plotly_chart(fig, use_container_width=True)
 
@@ -407,7 +553,7 @@ def main():
                 summary_df = pd.DataFrame({
                     'Category': category_totals.index,
                     'Amount': category_totals.values,
-                    'Txns': [category_counts.get(cat, 0) for cat in category_totals.index]
+                    'Txns': category_counts.reindex(category_totals.index, fill_value=0).values
                 })
 
                 # Calculate exact height needed (header + rows)
@@ -438,7 +584,7 @@ def main():
             col1, col2, col3 = st.columns([1, 1, 2])
 
             with col1:
-                category_options = ['All'] + sorted(spending_df['Category'].unique().tolist())
+                category_options = st.session_state['category_options']
                 selected_category = st.selectbox(
                     "Category",
                     options=category_options,
@@ -448,7 +594,7 @@ def main():
                 st.session_state.selected_category = selected_category
 
             with col2:
-                card_options = ['All'] + sorted(spending_df['Card'].unique().tolist())
+                card_options = st.session_state['card_options']
                 selected_card = st.selectbox(
                     "Card",
                     options=card_options,
@@ -459,11 +605,7 @@ def main():
 
             with col3:
                 # Show filter summary
-                filtered_df = spending_df.copy()
-                if selected_category != 'All':
-                    filtered_df = filtered_df[filtered_df['Category'] == selected_category]
-                if selected_card != 'All':
-                    filtered_df = filtered_df[filtered_df['Card'] == selected_card]
+                filtered_df = filter_view(st.session_state['df_version'], selected_category, selected_card, spending_df)
 
                 filtered_total = filtered_df['Amount'].sum()
                 st.markdown(f"""
@@ -477,9 +619,6 @@ def main():
 
             st.write("")  # Spacing
 
-            # Sort by date (most recent first)
-            filtered_df = filtered_df.sort_values('Date', ascending=False)
-
             # Display table
             st.dataframe(
                 filtered_df[['Date', 'Card', 'Description', 'Amount', 'Category']],
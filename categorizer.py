@@ -1,12 +1,18 @@
+import asyncio
+import hashlib
 import json
-import os
+import re
 from pathlib import Path
-from typing import List, Dict
-from anthropic import Anthropic
+from typing import List, Dict, Optional
+from anthropic import AsyncAnthropic
+from json_cache import JSONFileCache
 from models import Transaction
 
+# Store numbers, "#1234"-style references, standalone two-letter state codes and whitespace runs
+_MERCHANT_NOISE_RE = re.compile(r'\d+|#\S+|(?<!\S)[A-Z]{2}(?!\S)|\s+')
 
-class TransactionCategorizer:
+
+class TransactionCategorizer(JSONFileCache):
     """Categorize transactions using Claude API with caching"""
 
     CATEGORIES = [
@@ -23,33 +29,109 @@ class TransactionCategorizer:
         "Other"
     ]
 
+    # Static instructions sent ahead of every batch. Kept byte-identical across
+    # calls so Anthropic prompt caching can reuse it.
+    PROMPT_PREFIX = f"""Categorize these credit card transactions into one of these categories:
+{', '.join(CATEGORIES)}
+
+Return ONLY a JSON array with one category string per transaction, in the same order as the numbered list. Example for 3 transactions:
+["Grocery", "Food/Restaurant", "Transportation"]
+
+Be specific:
+- Trader Joe's, Whole Foods, Wegmans, Harris Teeter, Costco = Grocery
+- Restaurants, cafes, food delivery = Food/Restaurant
+- Gas, parking, ChargePoint, Uber, Lyft, tolls = Transportation
+- Netflix, ChatGPT, GitHub, Adobe, etc. = Subscriptions
+- GEICO, Spectrum, internet, phone bills = Utilities
+- Medical, dental = Healthcare
+- Amazon, IKEA (furniture), general shopping = Shopping
+- BILT RENT, rent payments, apartment/housing payments = Rent/Housing
+- AUTOPAY, PAYMENT, AUTOMATIC PAYMENT (payments TO the card company) = Payment/Credit
+
+IMPORTANT:
+- Payment/Credit is ONLY for payments you make TO the credit card company (like AUTOPAY PAYMENT), not merchant refunds
+- RENT PAYMENTS (like "BILT RENT", "BPS*BILT RENT") are Rent/Housing, NOT Payment/Credit
+- Card benefits/rewards (like "AMEX Dining Credit", "AMEX Dunkin' Credit") should be categorized by what they offset (e.g., dining credits = Food/Restaurant)
+- This way, category totals show your net spending after rewards"""
+
+    # Merchants the prompt already maps deterministically; matched against the
+    # upper-cased description before falling back to the LLM.
+    RULES = [
+        (re.compile(r"\b(?:TRADER JOE|WHOLE FOODS|WEGMANS|HARRIS TEETER|COSTCO)\b(?![\s*]*GAS)"), "Grocery"),
+        (re.compile(r"\b(?:CHARGEPOINT|LYFT|UBER)\b(?![\s*]*EATS)"), "Transportation"),
+        (re.compile(r"\b(?:NETFLIX|SPOTIFY|CHATGPT|OPENAI|GITHUB|ADOBE)\b"), "Subscriptions"),
+        (re.compile(r"\b(?:GEICO|SPECTRUM)\b"), "Utilities"),
+        (re.compile(r"\bBILT RENT\b"), "Rent/Housing"),
+    ]
+
+    # Payments to the card company. Only applied to credits (negative amounts):
+    # merchants bill through the same wording ("VERIZON WRLS AUTOPAY"), and those
+    # debits go to the LLM instead.
+    PAYMENT_RULE = re.compile(
+        r"\b(?:AUTOPAY|AUTOMATIC PAYMENT|(?:ONLINE|MOBILE|ELECTRONIC|WEB) PAYMENT|PYMT"
+        r"|PAYMENT\s*-\s*WEB|PAYMENT.*(?:THANK|RECEIVED))\b"
+    )
+
     def __init__(self, api_key: str, cache_file: Path = Path("cache/merchant_cache.json")):
-        self.client = Anthropic(api_key=api_key)
+        self.api_key = api_key
         self.cache_file = cache_file
         self.cache = self._load_cache()
+        self.fallback_count = 0  # Transactions the last run had to default to "Other"
 
-    def _load_cache(self) -> Dict[str, str]:
-        """Load merchant -> category cache from file"""
-        if self.cache_file.exists():
-            with open(self.cache_file, 'r') as f:
-                return json.load(f)
-        return {}
+    def _load_cache(self) -> Dict[str, Dict[str, str]]:
+        """Load merchant hash -> {"category", "norm"} cache from file"""
+        if not self.cache_file.exists():
+            return {}
 
-    def _save_cache(self):
-        """Save cache to file"""
-        self.cache_file.parent.mkdir(exist_ok=True)
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.cache, f, indent=2)
+        with open(self.cache_file, 'r') as f:
+            cache = json.load(f)
+
+        # Re-key entries from the old {merchant: category} format
+        for key, value in list(cache.items()):
+            if isinstance(value, str):
+                del cache[key]
+                norm = self._normalize_description(key)
+                cache.setdefault(self._hash_key(norm), {"category": value, "norm": norm})
+                self._dirty = True
+
+        return cache
+
+    @staticmethod
+    def _normalize_description(description: str) -> str:
+        """Reduce a description to its merchant name (drop store numbers, locations, etc.)"""
+        words = description.upper().split()
+        parts = _MERCHANT_NOISE_RE.sub(' ', ' '.join(words)).split()
+
+        # Too little left to tell merchants apart (e.g. "CHECK 1234", "76 - 12345"):
+        # fall back to the plain words so unrelated descriptions don't share a key
+        kept = ''.join(parts)
+        if sum(c.isalpha() for c in kept) < 3 or len(kept) < 0.6 * len(''.join(words)):
+            parts = words
 
-    def _get_cache_key(self, description: str) -> str:
-        """Extract merchant name for caching (remove location info, etc.)"""
-        # Simple heuristic: take first meaningful part before location codes
-        # You can make this more sophisticated
-        parts = description.upper().split()
         # Keep first 3-4 words as merchant identifier
-        return ' '.join(parts[:min(4, len(parts))])
+        return ' '.join(parts[:4])
+
+    @staticmethod
+    def _hash_key(norm: str) -> str:
+        """Compact, stable cache key for a normalized merchant name"""
+        return hashlib.blake2b(norm.encode(), digest_size=8).hexdigest()
 
-    def _categorize_batch_with_llm(self, transactions: List[Transaction]) -> Dict[str, str]:
+    def _get_cache_key(self, description: str) -> str:
+        """Cache key for a transaction description"""
+        return self._hash_key(self._normalize_description(description))
+
+    def _match_rules(self, transaction: Transaction) -> Optional[str]:
+        """Return the category of the first matching rule, or None"""
+        upper = transaction.description.upper()
+        for pattern, category in self.RULES:
+            if pattern.search(upper):
+                return category
+        if transaction.amount < 0 and self.PAYMENT_RULE.search(upper):
+            return "Payment/Credit"
+        return None
+
+    async def _categorize_batch_with_llm(self, client: AsyncAnthropic, semaphore: asyncio.Semaphore,
+                                         transactions: List[Transaction]) -> Dict[str, str]:
         """Send batch of transactions to Claude for categorization"""
 
         # Prepare the transaction list for the prompt
@@ -58,100 +140,125 @@ class TransactionCategorizer:
             for i, t in enumerate(transactions)
         ])
 
-        prompt = f"""Categorize these credit card transactions into one of these categories:
-{', '.join(self.CATEGORIES)}
-
-Transactions:
+        prompt = f"""Transactions ({len(transactions)}):
 {transaction_list}
 
-Return ONLY a JSON object mapping transaction number to category. Example:
-{{"1": "Grocery", "2": "Food/Restaurant", "3": "Transportation"}}
-
-Be specific:
-- Trader Joe's, Whole Foods, Wegmans, Harris Teeter, Costco = Grocery
-- Restaurants, cafes, food delivery = Food/Restaurant
-- Gas, parking, ChargePoint, Uber, Lyft, tolls = Transportation
-- Netflix, ChatGPT, GitHub, Adobe, etc. = Subscriptions
-- GEICO, Spectrum, internet, phone bills = Utilities
-- Medical, dental = Healthcare
-- Amazon, IKEA (furniture), general shopping = Shopping
-- BILT RENT, rent payments, apartment/housing payments = Rent/Housing
-- AUTOPAY, PAYMENT, AUTOMATIC PAYMENT (payments TO the card company) = Payment/Credit
-
-IMPORTANT:
-- Payment/Credit is ONLY for payments you make TO the credit card company (like AUTOPAY PAYMENT)
-- RENT PAYMENTS (like "BILT RENT", "BPS*BILT RENT") are Rent/Housing, NOT Payment/Credit
-- Card benefits/rewards (like "AMEX Dining Credit", "AMEX Dunkin' Credit") should be categorized by what they offset (e.g., dining credits = Food/Restaurant)
-- This way, category totals show your net spending after rewards
-
 Response (JSON only):"""
 
-        response = self.client.messages.create(
-            model="claude-haiku-4-5-20251001",
-            max_tokens=1000,
-            messages=[{
-                "role": "user",
-                "content": prompt
-            }]
-        )
+        # Stream the response so generation overlaps with transfer
+        async with semaphore:
+            async with client.messages.stream(
+                model="claude-haiku-4-5-20251001",
+                # A few tokens per category string, plus headroom for the brackets/fences
+                max_tokens=min(1000, 20 * len(transactions) + 80),
+                messages=[{
+                    "role": "user",
+                    "content": [
+                        # Identical across batches, so it can be served from the prompt cache
+                        {"type": "text", "text": self.PROMPT_PREFIX, "cache_control": {"type": "ephemeral"}},
+                        {"type": "text", "text": prompt}
+                    ]
+                }]
+            ) as stream:
+                response_text = ''.join([chunk async for chunk in stream.text_stream])
 
         # Parse the response
         try:
-            result_text = response.content[0].text.strip()
+            result_text = response_text.strip()
             # Remove markdown code blocks if present
             if result_text.startswith("```"):
                 result_text = result_text.split("```")[1]
                 if result_text.startswith("json"):
                     result_text = result_text[4:]
 
-            categorizations = json.loads(result_text)
+            categories = json.loads(result_text)
+
+            # One category per transaction, in order; anything else is unusable
+            if not isinstance(categories, list) or len(categories) != len(transactions):
+                print(f"Expected {len(transactions)} categories, got: {categories}")
+                return {}
 
-            # Convert number keys to descriptions
             result = {}
-            for i, transaction in enumerate(transactions):
-                key = str(i + 1)
-                if key in categorizations:
-                    result[transaction.description] = categorizations[key]
+            for transaction, category in zip(transactions, categories):
+                result[transaction.description] = category
 
             return result
         except (json.JSONDecodeError, IndexError) as e:
             print(f"Error parsing LLM response: {e}")
-            print(f"Response was: {response.content[0].text}")
+            print(f"Response was: {response_text}")
             return {}
 
-    def categorize_transactions(self, transactions: List[Transaction], batch_size: int = 20) -> List[Transaction]:
+    async def _categorize_all_async(self, batches: List[List[Transaction]], max_concurrency: int) -> List[Dict[str, str]]:
+        """Categorize all batches concurrently, with at most max_concurrency requests in flight"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+        async with AsyncAnthropic(api_key=self.api_key) as client:
+            return await asyncio.gather(*(
+                self._categorize_batch_with_llm(client, semaphore, batch) for batch in batches
+            ))
+
+    def categorize_transactions(self, transactions: List[Transaction], batch_size: int = 20, max_concurrency: int = 8) -> List[Transaction]:
         """Categorize all transactions, using cache when possible"""
 
+        # First pass: check cache, then the local rules; group the rest by merchant
+        # so each is sent only once
+        unique = {}  # cache key -> representative transaction
         uncategorized = []
+        rule_matches = 0
 
-        # First pass: check cache
         for transaction in transactions:
             cache_key = self._get_cache_key(transaction.description)
             if cache_key in self.cache:
-                transaction.category = self.cache[cache_key]
+                transaction.category = self.cache[cache_key]["category"]
+                continue
+
+            category = self._match_rules(transaction)
+            if category:
+                transaction.category = category
+                rule_matches += 1
             else:
-                uncategorized.append(transaction)
+                uncategorized.append((cache_key, transaction))
+                unique.setdefault(cache_key, transaction)
+
+        cached = len(transactions) - len(uncategorized) - rule_matches
+        print(f"Found {cached} cached, {rule_matches} matched by rules, need to categorize {len(uncategorized)} ({len(unique)} unique merchants)")
 
-        print(f"Found {len(transactions) - len(uncategorized)} cached, need to categorize {len(uncategorized)}")
+        # Second pass: categorize one representative per merchant, batches concurrently
+        representatives = list(unique.values())
+        batches = [representatives[i:i + batch_size] for i in range(0, len(representatives), batch_size)]
+        for i, batch in enumerate(batches):
+            print(f"Categorizing batch {i + 1} ({len(batch)} transactions)...")
 
-        # Second pass: categorize uncached in batches
-        for i in range(0, len(uncategorized), batch_size):
-            batch = uncategorized[i:i + batch_size]
-            print(f"Categorizing batch {i//batch_size + 1} ({len(batch)} transactions)...")
+        results = asyncio.run(self._categorize_all_async(batches, max_concurrency)) if batches else []
 
-            categorizations = self._categorize_batch_with_llm(batch)
+        categorizations = {}
+        for result in results:
+            categorizations.update(result)
 
-            # Apply categorizations and update cache
-            for transaction in batch:
-                if transaction.description in categorizations:
-                    category = categorizations[transaction.description]
-                    transaction.category = category
+        # Update cache, one entry per merchant
+        categories_by_key = {}
+        for cache_key, transaction in unique.items():
+            if transaction.description in categorizations:
+                category = categorizations[transaction.description]
+                categories_by_key[cache_key] = category
+                self.cache[cache_key] = {"category": category, "norm": self._normalize_description(transaction.description)}
+                self._dirty = True
 
-                    # Update cache
-                    cache_key = self._get_cache_key(transaction.description)
-                    self.cache[cache_key] = category
-                else:
-                    transaction.category = "Other"
+        # Fan results back out to every transaction of that merchant. Merchants the
+        # LLM didn't answer for fall back to "Other" and stay out of the cache, so
+        # the next run retries them
+        self.fallback_count = 0
+        for cache_key, transaction in uncategorized:
+            if cache_key in categories_by_key:
+                transaction.category = categories_by_key[cache_key]
+            else:
+                transaction.category = "Other"
+                self.fallback_count += 1
+        if self.fallback_count:
+            print(f"Could not categorize {self.fallback_count} transactions; marked as Other for now")
+
+        # Flag payments once so downstream filters can skip string compares
+        for transaction in transactions:
+            transaction.is_payment = transaction.category == "Payment/Credit"
 
         # Save updated cache
         self._save_cache()
@@ -0,0 +1,33 @@
+import json
+import os
+import tempfile
+
+# NamedTemporaryFile creates files as 0600; saved caches get the usual 0666 & ~umask
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+_CACHE_FILE_MODE = 0o666 & ~_UMASK
+
+
+class JSONFileCache:
+    """Mixin for classes that mirror a dict `self.cache` to the JSON file `self.cache_file`.
+
+    Set `self._dirty` whenever the cache gains entries that aren't on disk yet.
+    """
+
+    _dirty = False
+
+    def _save_cache(self):
+        """Save cache to file atomically (write a temp file, then rename over).
+
+        Skipped when nothing changed since the last load/save.
+        """
+        if not self._dirty:
+            return
+
+        self.cache_file.parent.mkdir(exist_ok=True)
+        # Unique temp name per writer, so concurrent saves can't rename each other's file away
+        with tempfile.NamedTemporaryFile('w', dir=self.cache_file.parent, suffix='.tmp', delete=False) as f:
+            f.write(json.dumps(self.cache, separators=(',', ':')))
+        os.chmod(f.name, _CACHE_FILE_MODE)
+        os.replace(f.name, self.cache_file)
+        self._dirty = False
@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class Transaction:
     """Unified transaction model"""
     date: datetime
@@ -11,6 +11,7 @@ class Transaction:
     amount: float
     card_provider: str
     category: Optional[str] = None
+    is_payment: bool = False  # Set alongside category, so filters avoid string compares
 
     def __str__(self):
         return f"{self.date.strftime('%Y-%m-%d')} | {self.card_provider:5} | ${self.amount:8.2f} | {self.description[:40]:40} | {self.category or 'Uncategorized'}"
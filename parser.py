@@ -1,19 +1,155 @@
 import csv
+import hashlib
+import heapq
 import json
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from operator import attrgetter
 from pathlib import Path
 from typing import List, Dict, Optional
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from anthropic import Anthropic
+from json_cache import JSONFileCache
 from models import Transaction
 
+# Date-like fragments stripped from file names when building schema cache keys, in one pass.
+# Full dates come first so the year pass can't leave '01-15-' behind; months are longest-first
+# so JANUARY isn't cut down to UARY, with letter lookarounds rather than \b because '_' is a
+# word character and would hide the month in 'STATEMENT_DECEMBER'
+_KEY_CLEAN_RE = re.compile(
+    r'\d{1,2}[-/]\d{1,2}[-/]\d{2,4}'
+    r'|20\d{2}'
+    r'|(?<![A-Z])(?:SEPTEMBER|FEBRUARY|NOVEMBER|DECEMBER|JANUARY|OCTOBER|AUGUST|MARCH|APRIL|JUNE|JULY|'
+    r'JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)(?![A-Z])'
+)
+_UNDERSCORES_RE = re.compile(r'_{2,}')
+_DASH_TO_UNDERSCORE = str.maketrans('-', '_')
+
+# Currency symbols, thousands separators and signs dropped when parsing amounts
+_AMOUNT_STRIP = str.maketrans('', '', '$,+-')
+
+# Stable export layouts recognized from their header row alone, keyed by the set of
+# lower-cased column names; columns are given lower-cased and mapped back to the
+# file's own spelling when matched
+_BUILTIN_FINGERPRINTS = {
+    frozenset({'transaction date', 'post date', 'description', 'category', 'type', 'amount', 'memo'}): {
+        "date_column": "transaction date", "description_column": "description", "amount_column": "amount",
+        "date_format": "%m/%d/%Y", "card_provider": "CHASE", "spending_is_negative": True,
+    },
+    frozenset({'date', 'description', 'card member', 'account #', 'amount'}): {
+        "date_column": "date", "description_column": "description", "amount_column": "amount",
+        "date_format": "%m/%d/%Y", "card_provider": "AMEX", "spending_is_negative": False,
+    },
+    frozenset({'trans. date', 'post date', 'description', 'amount', 'category'}): {
+        "date_column": "trans. date", "description_column": "description", "amount_column": "amount",
+        "date_format": "%m/%d/%Y", "card_provider": "DISCOVER", "spending_is_negative": False,
+    },
+    frozenset({'transaction date', 'clearing date', 'description', 'merchant', 'category', 'type',
+               'amount (usd)', 'purchased by'}): {
+        "date_column": "transaction date", "description_column": "merchant", "amount_column": "amount (usd)",
+        "date_format": "%m/%d/%Y", "card_provider": "APPLE", "spending_is_negative": False,
+    },
+    frozenset({'date', 'time', 'timezone', 'name', 'type', 'status', 'currency', 'amount', 'receipt id',
+               'balance'}): {
+        "date_column": "date", "description_column": "name", "amount_column": "amount",
+        "date_format": "%m/%d/%Y", "card_provider": "PAYPAL", "spending_is_negative": True,
+    },
+}
+
+
+# Below this much CSV in total, worker start-up costs more than parsing in-process
+_PARALLEL_PARSE_MIN_BYTES = 4 * 1024 * 1024
+
+
+def _worker_context():
+    """Start method for parse workers that doesn't fork the (possibly threaded) parent"""
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+@lru_cache(maxsize=4)
+def _get_client(api_key: str) -> Anthropic:
+    """One client (and connection pool) per API key, shared by every detector"""
+    return Anthropic(api_key=api_key)
+
+
+class CSVSchemaDetector(JSONFileCache):
+    """Uses Claude to automatically detect CSV schema (new schemas are written out by flush())"""
+
+    # Tool for structured output; kept identical across calls so it stays in the prompt cache
+    TOOLS = [{
+        "name": "identify_csv_schema",
+        "description": "Identify the schema of a credit card or payment CSV file by specifying which columns contain date, merchant description, and amount information",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "has_header": {
+                    "type": "boolean",
+                    "description": "Whether the CSV has a header row with column names"
+                },
+                "skip_rows": {
+                    "type": "integer",
+                    "description": "Number of metadata/title rows to skip before the header row (0 if header is on first line)"
+                },
+                "date_column": {
+                    "type": "string",
+                    "description": "Column name (if header exists) or column index (0-based, e.g., '0', '1') for the transaction date"
+                },
+                "description_column": {
+                    "type": "string",
+                    "description": "Column name or index for the merchant/transaction description or note"
+                },
+                "amount_column": {
+                    "type": "string",
+                    "description": "Column name or index for the transaction amount"
+                },
+                "date_format": {
+                    "type": "string",
+                    "description": "The date format string (e.g., '%m/%d/%Y', '%Y-%m-%d', '%Y-%m-%dT%H:%M:%S')"
+                },
+                "card_provider": {
+                    "type": "string",
+                    "description": "The card/payment provider name extracted from filename or content (e.g., 'AMEX', 'CHASE', 'VENMO', 'PAYPAL')"
+                },
+                "spending_is_negative": {
+                    "type": "boolean",
+                    "description": "Look at the MAJORITY of regular purchase transactions (restaurants, stores, subscriptions). True if these purchases are NEGATIVE (like -50.00 or '- $50'), False if purchases are POSITIVE (like 50.00 or '$50'). Ignore credits/refunds which are the opposite sign."
+                }
+            },
+            "required": ["has_header", "skip_rows", "date_column", "description_column", "amount_column", "date_format", "card_provider", "spending_is_negative"]
+        }
+    }]
 
-class CSVSchemaDetector:
-    """Uses Claude to automatically detect CSV schema"""
+    SYSTEM_PROMPT = """Analyze the credit card or payment service CSV file sample provided by the user and identify the schema.
+
+Identify:
+1. Does it have a header row with column names?
+2. How many rows need to be skipped before the header? (e.g., if there are title/metadata rows before the actual column headers, count them)
+3. Which column contains the transaction date?
+4. Which column contains the merchant/description/note?
+5. Which column contains the amount?
+6. What is the date format? (Python strptime format, e.g., '%m/%d/%Y', '%Y-%m-%dT%H:%M:%S')
+7. What provider is this? (look at filename: AMEX, CHASE, BILT, VENMO, PAYPAL, etc.)
+8. IMPORTANT - Look at the REGULAR PURCHASES (restaurants, stores, subscriptions - NOT credits/refunds):
+   - If most purchases show as POSITIVE numbers (like 19.99 or $50.00), then spending_is_negative=False
+   - If most purchases show as NEGATIVE numbers (like -19.99 or -$50.00), then spending_is_negative=True
+
+Use the identify_csv_schema tool to provide this information."""
 
     def __init__(self, api_key: str, cache_file: Path = Path("cache/schema_cache.json")):
-        self.client = Anthropic(api_key=api_key)
+        self.client = _get_client(api_key)
         self.cache_file = cache_file
         self.cache = self._load_cache()
+        self._cache_lock = threading.Lock()  # detect_schema may run from several threads
 
     def _load_cache(self) -> Dict:
         """Load schema cache from file"""
@@ -22,120 +158,97 @@ class CSVSchemaDetector:
                 return json.load(f)
         return {}
 
-    def _save_cache(self):
-        """Save cache to file"""
-        self.cache_file.parent.mkdir(exist_ok=True)
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.cache, f, indent=2)
+    def flush(self):
+        """Write newly detected schemas to disk"""
+        with self._cache_lock:
+            self._save_cache()
 
-    def _get_cache_key(self, file_path: Path) -> str:
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _get_cache_key(stem: str) -> str:
         """Generate cache key based on file name pattern.
 
-        Extracts a provider identifier by removing date-like parts from filename.
-        E.g., 'VenmoStatement_December_2025.csv' -> 'VENMOSTATEMENT'
-              'activity_AMEX_NOV.csv' -> 'ACTIVITY_AMEX'
+        Extracts a provider identifier by removing date-like parts from the
+        upper-cased file stem. E.g., 'VENMOSTATEMENT_DECEMBER_2025' -> 'VENMOSTATEMENT'
+                                     'ACTIVITY_AMEX_NOV' -> 'ACTIVITY_AMEX'
         """
-        import re
-        name = file_path.stem.upper()
+        # Remove common date patterns (months, years, dates), then normalize separators
+        name = _KEY_CLEAN_RE.sub('', stem).translate(_DASH_TO_UNDERSCORE)
+        name = _UNDERSCORES_RE.sub('_', name).strip('_')
 
-        # Remove common date patterns (months, years, dates)
-        months = r'(JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC|JANUARY|FEBRUARY|MARCH|APRIL|JUNE|JULY|AUGUST|SEPTEMBER|OCTOBER|NOVEMBER|DECEMBER)'
-        name = re.sub(months, '', name)
-        name = re.sub(r'20\d{2}', '', name)  # Remove years like 2024, 2025
-        name = re.sub(r'\d{1,2}[-/]\d{1,2}[-/]\d{2,4}', '', name)  # Remove dates
-        name = re.sub(r'[_\-]+', '_', name)  # Normalize separators
-        name = name.strip('_')  # Remove leading/trailing underscores
+        return name if name else stem
 
-        return name if name else file_path.stem.upper()
+    @staticmethod
+    def _match_builtin(lines: List[str]) -> Optional[Dict]:
+        """Build a schema locally if one of the sample lines is a known header row"""
+        for skip_rows, line in enumerate(lines):
+            if not line:
+                continue
+            header = next(csv.reader([line]))
+            names = {cell.strip().lower(): cell for cell in header}
+            template = _BUILTIN_FINGERPRINTS.get(frozenset(names))
+            if template is None:
+                continue
+
+            schema = dict(template, has_header=True, skip_rows=skip_rows)
+            for field in ('date_column', 'description_column', 'amount_column'):
+                schema[field] = names[template[field]]
+            return schema
+        return None
+
+    @staticmethod
+    def _read_sample(file_path: Path, sample_rows: int = 10) -> List[str]:
+        """Read the first sample rows (stripped) sent for detection"""
+        with open(file_path, 'r', buffering=1 << 16) as f:
+            return [line.strip() for line in islice(f, sample_rows + 1)]  # +1 for potential header
+
+    @staticmethod
+    def _sample_key(csv_sample: str) -> str:
+        """Cache key for an exact CSV sample"""
+        return f"sample:{hashlib.sha256(csv_sample.encode()).hexdigest()}"
 
     def detect_schema(self, file_path: Path, sample_rows: int = 10) -> Dict:
         """Detect CSV schema using Claude API"""
 
         # Check cache first
-        cache_key = self._get_cache_key(file_path)
+        cache_key = self._get_cache_key(file_path.stem.upper())
         if cache_key in self.cache:
             print(f"  Using cached schema for {cache_key}")
             return self.cache[cache_key]
 
-        # Read sample rows
-        with open(file_path, 'r') as f:
-            content = []
-            for i, line in enumerate(f):
-                if i >= sample_rows + 1:  # +1 for potential header
-                    break
-                content.append(line.strip())
+        content = self._read_sample(file_path, sample_rows)
 
-        csv_sample = '\n'.join(content)
+        schema = self._match_builtin(content)
+        if schema is not None:
+            with self._cache_lock:
+                self.cache[cache_key] = schema
+                self._dirty = True
+            print(f"  Recognized built-in layout for {cache_key}: {schema}")
+            return schema
 
-        # Define the tool for structured output
-        tools = [{
-            "name": "identify_csv_schema",
-            "description": "Identify the schema of a credit card or payment CSV file by specifying which columns contain date, merchant description, and amount information",
-            "input_schema": {
-                "type": "object",
-                "properties": {
-                    "has_header": {
-                        "type": "boolean",
-                        "description": "Whether the CSV has a header row with column names"
-                    },
-                    "skip_rows": {
-                        "type": "integer",
-                        "description": "Number of metadata/title rows to skip before the header row (0 if header is on first line)"
-                    },
-                    "date_column": {
-                        "type": "string",
-                        "description": "Column name (if header exists) or column index (0-based, e.g., '0', '1') for the transaction date"
-                    },
-                    "description_column": {
-                        "type": "string",
-                        "description": "Column name or index for the merchant/transaction description or note"
-                    },
-                    "amount_column": {
-                        "type": "string",
-                        "description": "Column name or index for the transaction amount"
-                    },
-                    "date_format": {
-                        "type": "string",
-                        "description": "The date format string (e.g., '%m/%d/%Y', '%Y-%m-%d', '%Y-%m-%dT%H:%M:%S')"
-                    },
-                    "card_provider": {
-                        "type": "string",
-                        "description": "The card/payment provider name extracted from filename or content (e.g., 'AMEX', 'CHASE', 'VENMO', 'PAYPAL')"
-                    },
-                    "spending_is_negative": {
-                        "type": "boolean",
-                        "description": "Look at the MAJORITY of regular purchase transactions (restaurants, stores, subscriptions). True if these purchases are NEGATIVE (like -50.00 or '- $50'), False if purchases are POSITIVE (like 50.00 or '$50'). Ignore credits/refunds which are the opposite sign."
-                    }
-                },
-                "required": ["has_header", "skip_rows", "date_column", "description_column", "amount_column", "date_format", "card_provider", "spending_is_negative"]
-            }
-        }]
+        csv_sample = '\n'.join(content)
 
-        prompt = f"""Analyze this credit card or payment service CSV file sample and identify the schema.
+        # A byte-identical sample under a different file name has the same layout
+        sample_key = self._sample_key(csv_sample)
+        if sample_key in self.cache:
+            schema = self.cache[sample_key]
+            with self._cache_lock:
+                self.cache[cache_key] = schema
+                self._dirty = True
+            print(f"  Using cached schema for {cache_key} (matched sample)")
+            return schema
 
-Filename: {file_path.name}
+        prompt = f"""Filename: {file_path.name}
 
 CSV Sample:
-{csv_sample}
-
-Identify:
-1. Does it have a header row with column names?
-2. How many rows need to be skipped before the header? (e.g., if there are title/metadata rows before the actual column headers, count them)
-3. Which column contains the transaction date?
-4. Which column contains the merchant/description/note?
-5. Which column contains the amount?
-6. What is the date format? (Python strptime format, e.g., '%m/%d/%Y', '%Y-%m-%dT%H:%M:%S')
-7. What provider is this? (look at filename: AMEX, CHASE, BILT, VENMO, PAYPAL, etc.)
-8. IMPORTANT - Look at the REGULAR PURCHASES (restaurants, stores, subscriptions - NOT credits/refunds):
-   - If most purchases show as POSITIVE numbers (like 19.99 or $50.00), then spending_is_negative=False
-   - If most purchases show as NEGATIVE numbers (like -19.99 or -$50.00), then spending_is_negative=True
-
-Use the identify_csv_schema tool to provide this information."""
+{csv_sample}"""
 
         response = self.client.messages.create(
             model="claude-haiku-4-5-20251001",
-            max_tokens=1000,
-            tools=tools,
+            max_tokens=300,  # The tool input is a small JSON object
+            tools=self.TOOLS,
+            tool_choice={"type": "tool", "name": "identify_csv_schema"},  # No preamble before the tool call
+            system=[{"type": "text", "text": self.SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}],
             messages=[{
                 "role": "user",
                 "content": prompt
@@ -148,14 +261,46 @@ Use the identify_csv_schema tool to provide this information."""
                 schema = block.input
 
                 # Cache the schema
-                self.cache[cache_key] = schema
-                self._save_cache()
+                with self._cache_lock:
+                    self.cache[cache_key] = schema
+                    self.cache[sample_key] = schema
+                    self._dirty = True
 
                 print(f"  Detected schema for {cache_key}: {schema}")
                 return schema
 
         raise ValueError("Failed to detect CSV schema")
 
+    def detect_all(self, file_paths: List[Path], max_workers: int = 8) -> Dict[Path, Dict]:
+        """Detect schemas for several files, overlapping their API calls.
+
+        Files that share a cache key (e.g. two months from the same card) share
+        one detection, and so do differently named files with identical samples:
+        only the first of those goes out to the API, the rest then match its
+        sample cache entry.
+        """
+        representatives = {}
+        for file_path in file_paths:
+            representatives.setdefault(self._get_cache_key(file_path.stem.upper()), file_path)
+
+        first, repeats = {}, {}
+        seen_samples = set()
+        for cache_key, file_path in representatives.items():
+            if cache_key not in self.cache:
+                sample_key = self._sample_key('\n'.join(self._read_sample(file_path)))
+                if sample_key in seen_samples:
+                    repeats[cache_key] = file_path
+                    continue
+                seen_samples.add(sample_key)
+            first[cache_key] = file_path
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(first)))) as executor:
+            schemas = dict(zip(first, executor.map(self.detect_schema, first.values())))
+        for cache_key, file_path in repeats.items():
+            schemas[cache_key] = self.detect_schema(file_path)
+
+        return {file_path: schemas[self._get_cache_key(file_path.stem.upper())] for file_path in file_paths}
+
 
 class CSVParser:
     """Universal CSV parser using LLM-detected schema"""
@@ -174,10 +319,9 @@ class CSVParser:
 
         # Check for negative sign (could be at start or after currency symbol)
         is_negative = '-' in amount_str
-        is_positive = '+' in amount_str
 
         # Remove currency symbols, +/-, commas, and spaces
-        cleaned = amount_str.replace('$', '').replace(',', '').replace('+', '').replace('-', '').strip()
+        cleaned = amount_str.translate(_AMOUNT_STRIP).strip()
 
         if not cleaned:
             raise ValueError(f"Empty amount after cleaning: {amount_str}")
@@ -208,96 +352,185 @@ class CSVParser:
             # Already in correct convention
             return amount
 
-    def parse_file(self, file_path: Path) -> List[Transaction]:
-        """Parse CSV file using auto-detected schema"""
-
-        print(f"Parsing {file_path.name}...")
+    def parse_file(self, file_path: Path, schema: Optional[Dict] = None) -> List[Transaction]:
+        """Parse CSV file using auto-detected schema (detected here unless given), oldest first"""
 
         # Detect schema
-        schema = self.schema_detector.detect_schema(file_path)
+        if schema is None:
+            schema = self.schema_detector.detect_schema(file_path)
+            self.schema_detector.flush()
 
-        transactions = []
+        return self._parse_with_schema(file_path, schema)
+
+    @staticmethod
+    def _read_columns(file_path: Path, skip_rows: int, has_header: bool, columns: List) -> pd.DataFrame:
+        """Read just the given columns (names, or indices without a header) as strings.
+
+        Uses Arrow's multithreaded CSV reader, falling back to pandas for files
+        it rejects, such as ragged rows with trailing extra fields.
+        """
+        wanted = list(dict.fromkeys(columns))
+        arrow_names = wanted if has_header else [f"f{column}" for column in wanted]
+        try:
+            table = pacsv.read_csv(
+                file_path,
+                read_options=pacsv.ReadOptions(skip_rows=skip_rows, autogenerate_column_names=not has_header),
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=arrow_names,
+                    column_types={name: pa.string() for name in arrow_names},
+                ),
+            )
+            df = table.to_pandas()
+            if not has_header:
+                df.columns = [int(name[1:]) for name in df.columns]
+            return df
+        except pa.ArrowException:
+            pass
 
         with open(file_path, 'r') as f:
-            # Skip metadata rows if specified
-            skip_rows = schema.get('skip_rows', 0)
-            for _ in range(skip_rows):
-                next(f)
-
-            if schema['has_header']:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        date_str = row[schema['date_column']].strip()
-                        description = row[schema['description_column']].strip()
-                        amount_str = row[schema['amount_column']].strip()
-
-                        # Skip rows with empty essential fields
-                        if not date_str or not amount_str:
-                            continue
-
-                        date = datetime.strptime(date_str, schema['date_format'])
-                        raw_amount = self.parse_amount(amount_str)
-
-                        # Normalize amount to consistent convention
-                        amount = self.normalize_amount(raw_amount, schema.get('spending_is_negative', True))
-
-                        transactions.append(Transaction(
-                            date=date,
-                            description=description,
-                            amount=amount,
-                            card_provider=schema['card_provider']
-                        ))
-                    except (ValueError, KeyError) as e:
-                        # Silently skip invalid rows (headers, footers, etc.)
-                        pass
-            else:
-                reader = csv.reader(f)
-                for row in reader:
-                    try:
-                        if len(row) == 0:
-                            continue
-
-                        date_idx = int(schema['date_column'])
-                        desc_idx = int(schema['description_column'])
-                        amount_idx = int(schema['amount_column'])
-
-                        date_str = row[date_idx].strip()
-                        description = row[desc_idx].strip()
-                        amount_str = row[amount_idx].strip()
-
-                        # Skip rows with empty essential fields
-                        if not date_str or not amount_str:
-                            continue
-
-                        date = datetime.strptime(date_str, schema['date_format'])
-                        raw_amount = self.parse_amount(amount_str)
-
-                        # Normalize amount to consistent convention
-                        amount = self.normalize_amount(raw_amount, schema.get('spending_is_negative', True))
-
-                        transactions.append(Transaction(
-                            date=date,
-                            description=description,
-                            amount=amount,
-                            card_provider=schema['card_provider']
-                        ))
-                    except (ValueError, IndexError) as e:
-                        print(f"  Warning: Skipping invalid row: {row} - {e}")
-
-        print(f"  Found {len(transactions)} transactions")
-        return transactions
-
-    def parse_all(self, data_dir: Path) -> List[Transaction]:
-        """Parse all CSV files in the data directory"""
-        all_transactions = []
-
-        csv_files = list(data_dir.glob('*.csv')) + list(data_dir.glob('*.CSV'))
-
-        for csv_file in csv_files:
-            transactions = self.parse_file(csv_file)
-            all_transactions.extend(transactions)
-
-        # Sort by date
-        all_transactions.sort(key=lambda t: t.date)
-        return all_transactions
+            try:
+                return pd.read_csv(
+                    f,
+                    skiprows=skip_rows,
+                    header=0 if has_header else None,
+                    usecols=wanted,
+                    index_col=False,
+                    dtype=str,
+                    keep_default_na=False,
+                )
+            except pd.errors.EmptyDataError:
+                return pd.DataFrame()
+            except ValueError as e:
+                # The schema's columns aren't in the file; decoding and parse errors
+                # (also ValueErrors) must still surface
+                if 'Usecols do not match columns' not in str(e):
+                    raise
+                return pd.DataFrame()
+
+    def parse_file_df(self, file_path: Path, schema: Optional[Dict] = None) -> pd.DataFrame:
+        """Parse CSV file into a DataFrame instead of Transaction objects, oldest first.
+
+        Columns: date (datetime64, or aware datetimes for %z formats), description
+        (string), amount (float64, spending positive) and card_provider (categorical,
+        one shared category).
+        """
+
+        # Detect schema
+        if schema is None:
+            schema = self.schema_detector.detect_schema(file_path)
+            self.schema_detector.flush()
+
+        return self._frame_with_schema(file_path, schema)
+
+    @staticmethod
+    def _parse_with_schema(file_path: Path, schema: Dict) -> List[Transaction]:
+        """Parse CSV file against a known schema.
+
+        A staticmethod so parse_all can ship it to worker processes without the
+        detector (and its API client) in tow.
+        """
+        rows = CSVParser._frame_with_schema(file_path, schema)
+
+        card_provider = schema['card_provider']
+        return [
+            Transaction(date=date, description=desc, amount=amt, card_provider=card_provider)
+            for date, desc, amt in zip(
+                rows['date'].dt.to_pydatetime() if rows['date'].dtype.kind == 'M' else rows['date'],
+                rows['description'], rows['amount'].tolist()
+            )
+        ]
+
+    @staticmethod
+    def _frame_with_schema(file_path: Path, schema: Dict) -> pd.DataFrame:
+        """Parse CSV file against a known schema into the parse_file_df columns"""
+
+        print(f"Parsing {file_path.name}...")
+
+        has_header = schema['has_header']
+        columns = [schema['date_column'], schema['description_column'], schema['amount_column']]
+        if not has_header:
+            columns = [int(column) for column in columns]
+        date_col, desc_col, amount_col = columns
+
+        df = CSVParser._read_columns(file_path, schema.get('skip_rows', 0), has_header, columns)
+
+        if any(column not in df.columns for column in columns):
+            df = pd.DataFrame({column: pd.Series(dtype=str) for column in columns})
+
+        date_str = df[date_col].str.strip()
+        description = df[desc_col].str.strip()
+        amount_str = df[amount_col].str.strip()
+
+        # Skip rows with empty essential fields
+        present = (date_str != '') & (amount_str != '')
+
+        date_format = schema['date_format']
+        if '%z' in date_format:
+            # UTC offsets can change within a file (DST), which to_datetime rejects;
+            # parse per row and keep each row's own offset, as strptime always did
+            def parse_date(value):
+                try:
+                    return datetime.strptime(value, date_format)
+                except ValueError:
+                    return None
+
+            dates = date_str.map(parse_date).astype(object)
+        else:
+            dates = pd.to_datetime(date_str, format=date_format, errors='coerce')
+
+        # Plain numbers (most sources) convert directly; only the rest get the
+        # parse_amount treatment: any '-' makes it negative; strip $, commas and signs
+        amount = pd.to_numeric(amount_str, errors='coerce')
+        messy = amount.isna() & present
+        if messy.any():
+            raw = amount_str[messy]
+            cleaned = pd.to_numeric(raw.str.translate(_AMOUNT_STRIP).str.strip(), errors='coerce')
+            amount[messy] = cleaned.mask(raw.str.contains('-', regex=False), -cleaned)
+
+        # Normalize amount to consistent convention
+        if schema.get('spending_is_negative', True):
+            amount = -amount
+
+        valid = present & dates.notna() & amount.notna()
+        if not has_header:
+            # Headered files silently skip invalid rows (headers, footers, etc.)
+            for row in df[present & ~valid].itertuples(index=False):
+                print(f"  Warning: Skipping invalid row: {list(row)}")
+
+        rows = pd.DataFrame({'date': dates, 'description': description, 'amount': amount.astype(np.float64)})[valid]
+        if not rows['date'].is_monotonic_increasing:
+            # Oldest first, so parse_all can merge files instead of sorting everything
+            rows = rows.sort_values('date', kind='stable')
+        rows = rows.reset_index(drop=True)
+        rows['card_provider'] = pd.Categorical.from_codes(
+            np.zeros(len(rows), dtype=np.int8), [schema['card_provider']]
+        )
+
+        print(f"  Found {len(rows)} transactions")
+        return rows
+
+    def parse_all(self, data_dir: Path, max_workers: int = 8) -> List[Transaction]:
+        """Parse all CSV files in the data directory.
+
+        Schemas for every file are detected up front with their API calls in
+        flight together; the files are then parsed in parallel worker processes
+        and their date-sorted results merged.
+        """
+        # One directory pass; catches any extension casing (.csv, .CSV, .Csv, ...)
+        csv_files = sorted(p for p in data_dir.iterdir() if p.suffix.lower() == '.csv' and p.is_file())
+        schemas = self.schema_detector.detect_all(csv_files, max_workers=max_workers)
+        self.schema_detector.flush()
+        file_schemas = [schemas[file_path] for file_path in csv_files]
+
+        workers = min(max_workers, len(csv_files), os.cpu_count() or 1)
+        total_bytes = sum(file_path.stat().st_size for file_path in csv_files)
+        if workers > 1 and total_bytes >= _PARALLEL_PARSE_MIN_BYTES:
+            # Never fork: callers like the Streamlit server are multi-threaded
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_worker_context()) as executor:
+                results = list(executor.map(self._parse_with_schema, csv_files, file_schemas))
+        else:
+            # Not worth starting processes for a few small files (or a single core)
+            results = list(map(self._parse_with_schema, csv_files, file_schemas))
+
+        # Each file comes back date-sorted; merging keeps ties in file order like a global sort would
+        return list(heapq.merge(*results, key=attrgetter('date')))